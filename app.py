@@ -2,15 +2,44 @@
 Flask Web Application for Redis Semantic Caching Demo
 Replicates the functionality of demo_search.py with a web interface
 """
+import functools
+import io
 import time
-from flask import Flask, render_template, request, jsonify
-from rsearch_module import get_cached_or_generate, check_openai_status
+from flask import Flask, render_template, request, jsonify, g, send_file
+from rsearch_module import get_cached_or_generate, check_openai_status, snapshot_local_index, profiler, make_namespace
 
 app = Flask(__name__)
 
 # Store query history for the session
 query_history = []
 
+def require_profile_token(view):
+    """Reject requests whose debug header does not carry PROFILE_TOKEN"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not profiler.authorized(request.headers):
+            return jsonify({
+                "status": "error",
+                "message": "Forbidden"
+            }), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.before_request
+def start_profile():
+    """Profile sampled /api/query requests and any request with the debug header and token"""
+    if request.path.startswith('/api/admin/'):
+        return
+    if profiler.should_profile(request.headers, sampled=request.path == '/api/query'):
+        g.profile = profiler.start(f"{request.method} {request.path}")
+
+@app.teardown_request
+def finish_profile(error=None):
+    """Store the profile of the finished request, if it was profiled"""
+    handle = g.pop('profile', None)
+    if handle is not None:
+        profiler.finish(handle)
+
 @app.route('/')
 def index():
     """Main page with the demo interface"""
@@ -34,19 +63,34 @@ def api_query():
     try:
         data = request.get_json()
         query = data.get('query', '').strip()
+        namespace = data.get('namespace')
+        # Optional generation parameters; each combination is cached separately
+        generation = {key: data[key] for key in ('model', 'temperature', 'max_tokens') if key in data}
         
         if not query:
             return jsonify({
                 "status": "error",
                 "message": "Query cannot be empty"
             }), 400
+
+        # Only allowed tenants/models and bounded parameters, so clients cannot create
+        # unbounded cache indexes or pick expensive models
+        try:
+            cache_namespace = make_namespace(namespace, **generation)
+        except ValueError as e:
+            return jsonify({
+                "status": "error",
+                "message": str(e)
+            }), 400
         
         # Record start time
         start_time = time.time()
         
         # Execute the query
         try:
-            result = get_cached_or_generate(query)
+            result = get_cached_or_generate(query, namespace=cache_namespace.tenant, model=cache_namespace.model,
+                                            temperature=cache_namespace.temperature,
+                                            max_tokens=cache_namespace.max_tokens)
             query_time = time.time() - start_time
             
             # Determine if it was likely a cache hit (very fast response)
@@ -255,6 +299,58 @@ def api_clear_history():
         "message": "History cleared"
     })
 
+@app.route('/api/admin/snapshot', methods=['POST'])
+@require_profile_token
+def api_admin_snapshot():
+    """Write new L1 index entries to the on-disk snapshot"""
+    try:
+        written = snapshot_local_index()
+        return jsonify({
+            "status": "success",
+            "message": f"Snapshot written ({written} new entries)"
+        })
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "message": f"Snapshot failed: {str(e)}"
+        }), 500
+
+@app.route('/api/admin/profiles')
+@require_profile_token
+def api_admin_profiles():
+    """List the slowest profiled requests with their per-stage spans"""
+    return jsonify({
+        "status": "success",
+        "data": profiler.profiles()
+    })
+
+@app.route('/api/admin/profiles/<int:profile_id>')
+@require_profile_token
+def api_admin_profile(profile_id):
+    """Download one profile: pstats-compatible .prof for cProfile, collapsed stacks otherwise"""
+    record = profiler.get(profile_id)
+    if record is None:
+        return jsonify({
+            "status": "error",
+            "message": f"Profile {profile_id} not found"
+        }), 404
+
+    if record["raw"] is not None and request.args.get('format') != 'text':
+        return send_file(io.BytesIO(record["raw"]), mimetype='application/octet-stream',
+                         as_attachment=True, download_name=f"profile-{profile_id}.prof")
+    return send_file(io.BytesIO(record["report"].encode('utf-8')), mimetype='text/plain',
+                     as_attachment=True, download_name=f"profile-{profile_id}.txt")
+
+@app.route('/api/admin/profiles/clear', methods=['POST'])
+@require_profile_token
+def api_admin_clear_profiles():
+    """Drop all stored profiles"""
+    profiler.clear()
+    return jsonify({
+        "status": "success",
+        "message": "Profiles cleared"
+    })
+
 if __name__ == '__main__':
     print("🚀 Starting Redis Semantic Cache Web Demo")
     print("📁 Make sure your .env file contains RDS_URI and OPENAI_API_KEY")
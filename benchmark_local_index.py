@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Local Index Benchmark
+
+Compares brute-force search against two-stage (PCA coarse pass + exact rerank)
+search in LocalSemanticIndex, reporting recall, per-query search latency,
+add() latency and PCA refit time at several cache sizes.
+
+Only rsearch_module.local_index is imported, so no Redis or OpenAI
+configuration is needed.
+
+Vectors are synthetic: a low-rank signal plus noise, which mimics how sentence
+embeddings concentrate their variance in a small number of directions.
+Queries are perturbed copies of stored entries, so each has a known neighbour.
+
+Example:
+    python benchmark_local_index.py --sizes 10000 50000 100000 --reduced-dims 64 128
+"""
+import argparse
+import time
+
+import numpy as np
+
+from rsearch_module.local_index import LocalSemanticIndex
+
+
+def synthetic_vectors(count, dims, rank, rng):
+    """Generate unit vectors with most of their variance in `rank` directions."""
+    basis = rng.normal(size=(rank, dims)).astype(np.float32)
+    vectors = rng.normal(size=(count, rank)).astype(np.float32) @ basis
+    vectors += 0.3 * np.sqrt(rank) * rng.normal(size=(count, dims)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build_index(vectors, reduced_dims, shortlist):
+    """
+    Fill an index with the given vectors; response is the row number.
+    Returns the index and per-add latencies in milliseconds. Background refits
+    started by add() run concurrently; a final refit() waits for them and
+    fits the remaining rows, so every query below sees the full projection.
+    """
+    index = LocalSemanticIndex(
+        dims=vectors.shape[1],
+        reduced_dims=reduced_dims,
+        shortlist=shortlist,
+        capacity=len(vectors),
+    )
+    latencies = []
+    for row, vector in enumerate(vectors):
+        start = time.perf_counter()
+        index.add(vector, row)
+        latencies.append((time.perf_counter() - start) * 1000)
+    if reduced_dims is not None:
+        index.refit()
+    return index, np.array(latencies)
+
+
+def run_queries(index, queries, threshold):
+    """Return (answers, per-query latencies in milliseconds)."""
+    answers, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        found = index.search(query, threshold)
+        latencies.append((time.perf_counter() - start) * 1000)
+        answers.append(found[0] if found else None)
+    return answers, np.array(latencies)
+
+
+def print_row(size, mode, recall, latencies, add_latencies, refit_ms):
+    """Print one result line; refit_ms is the duration of the final full refit."""
+    refit = f"{refit_ms:>8.1f}" if refit_ms is not None else f"{'-':>8}"
+    print(f"   {size:>8}  {mode:>8}  {recall:>7.1%}  {latencies.mean():>9.3f}  {np.percentile(latencies, 99):>7.3f}  "
+          f"{add_latencies.mean():>7.3f}  {np.percentile(add_latencies, 99):>7.3f}  {add_latencies.max():>7.1f}  {refit}")
+
+
+def main():
+    """Run the benchmark and print a recall/latency table."""
+    parser = argparse.ArgumentParser(description="Benchmark two-stage local semantic search")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--reduced-dims", type=int, nargs="+", default=[64, 128])
+    parser.add_argument("--shortlist", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dims", type=int, default=768)
+    parser.add_argument("--rank", type=int, default=96, help="Intrinsic dimensionality of the synthetic data")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+
+    print("⚡ Local Index Benchmark")
+    print("=" * 96)
+    print(f"   {'entries':>8}  {'mode':>8}  {'recall':>7}  {'search ms':>9}  {'p99 ms':>7}  "
+          f"{'add ms':>7}  {'add p99':>7}  {'add max':>7}  {'refit ms':>8}")
+
+    for size in args.sizes:
+        vectors = synthetic_vectors(size, args.dims, args.rank, rng)
+        targets = rng.integers(0, size, args.queries)
+        queries = vectors[targets] + 0.01 * rng.normal(size=(args.queries, args.dims)).astype(np.float32)
+
+        baseline, add_latencies = build_index(vectors, None, args.shortlist)
+        expected, latencies = run_queries(baseline, queries, args.threshold)
+        print_row(size, "full", 1.0, latencies, add_latencies, None)
+
+        for reduced_dims in args.reduced_dims:
+            index, add_latencies = build_index(vectors, reduced_dims, args.shortlist)
+            answers, latencies = run_queries(index, queries, args.threshold)
+            recall = np.mean([a == e for a, e in zip(answers, expected)])
+            print_row(size, f"pca-{reduced_dims}", recall, latencies, add_latencies, index.last_refit_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Distance Threshold Calibration
+
+Measures how a looser or stricter SemanticCache distance threshold trades
+cache hit ratio against wrong answers, using:
+
+  * a labeled pairs file (JSONL): {"prompt_a": ..., "prompt_b": ..., "paraphrase": true}
+  * a query log: one prompt per line (plain text) or JSONL with a "prompt" field
+
+Example:
+    python calibrate_threshold.py pairs.jsonl queries.txt --max-false-hit-rate 0.01
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Only the embedding model is needed; no Redis or OpenAI configuration
+from rsearch_module.embeddings import embed_batch
+from rsearch_module.calibration import (
+    pair_distances,
+    replay_hits,
+    threshold_curves,
+    recommend_threshold,
+)
+
+
+def load_pairs(path):
+    """Load labeled prompt pairs from a JSONL file."""
+    prompts_a, prompts_b, labels = [], [], []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            try:
+                prompts_a.append(record["prompt_a"])
+                prompts_b.append(record["prompt_b"])
+                labels.append(bool(record["paraphrase"]))
+            except KeyError as e:
+                raise ValueError(f"{path}:{line_number}: missing field {e}") from e
+    return prompts_a, prompts_b, labels
+
+
+def load_query_log(path):
+    """Load prompts from a plain text or JSONL query log."""
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                try:
+                    queries.append(json.loads(line)["prompt"])
+                except KeyError as e:
+                    raise ValueError(f"{path}:{line_number}: missing field {e}") from e
+            else:
+                queries.append(line)
+    return queries
+
+
+def positive_float(value):
+    """argparse type for a float greater than zero."""
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {value}")
+    return number
+
+
+def main():
+    """Compute threshold curves and print a recommendation."""
+    parser = argparse.ArgumentParser(description="Calibrate the semantic cache distance threshold")
+    parser.add_argument("pairs", help="JSONL file of labeled prompt pairs")
+    parser.add_argument("query_log", help="Query log, one prompt per line or JSONL")
+    parser.add_argument("--min", type=float, default=0.0, help="Smallest threshold to evaluate")
+    parser.add_argument("--max", type=float, default=0.5, help="Largest threshold to evaluate")
+    parser.add_argument("--step", type=positive_float, default=0.01, help="Threshold step size")
+    parser.add_argument("--max-false-hit-rate", type=float, default=0.01,
+                        help="Highest acceptable share of non-paraphrase pairs served from cache")
+    parser.add_argument("--csv", help="Optional path to write the full curves as CSV")
+    args = parser.parse_args()
+    if args.max < args.min:
+        parser.error("--max must not be smaller than --min")
+
+    print("🎯 Distance Threshold Calibration")
+    print("=" * 40)
+
+    prompts_a, prompts_b, labels = load_pairs(args.pairs)
+    queries = load_query_log(args.query_log)
+    if not prompts_a or not queries:
+        print("❌ Both the pairs file and the query log must contain at least one entry")
+        return 1
+
+    print(f"📄 Labeled pairs: {len(labels)} ({sum(labels)} paraphrases)")
+    print(f"📄 Logged queries: {len(queries)}")
+
+    print("\n🧠 Embedding prompts...")
+    pair_dist = pair_distances(embed_batch(prompts_a), embed_batch(prompts_b))
+    log_vectors = embed_batch(queries)
+
+    thresholds = np.arange(args.min, args.max + args.step / 2, args.step)
+    print("🔁 Replaying the query log at each threshold...")
+    log_hits = replay_hits(log_vectors, thresholds)
+    curves = threshold_curves(thresholds, pair_dist, labels, log_hits)
+
+    print("\n📊 Threshold curves:")
+    print(f"   {'threshold':>9}  {'hit ratio':>9}  {'false hits':>10}  {'recall':>7}")
+    for i, threshold in enumerate(curves["thresholds"]):
+        print(f"   {threshold:>9.3f}  {curves['hit_ratio'][i]:>9.1%}  "
+              f"{curves['false_hit_rate'][i]:>10.1%}  {curves['paraphrase_recall'][i]:>7.1%}")
+
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["threshold", "hit_ratio", "false_hit_rate", "paraphrase_recall"])
+            for i, threshold in enumerate(curves["thresholds"]):
+                writer.writerow([f"{threshold:.4f}", curves["hit_ratio"][i],
+                                 curves["false_hit_rate"][i], curves["paraphrase_recall"][i]])
+        print(f"\n💾 Curves written to {args.csv}")
+
+    best = recommend_threshold(curves, args.max_false_hit_rate)
+    print("\n✅ Recommendation:")
+    if best is None:
+        print(f"   No threshold keeps false hits under {args.max_false_hit_rate:.1%}.")
+        print("   💡 Consider a stricter --min or a larger labeled set")
+        return 1
+
+    print(f"   CACHE_THRESHOLD={curves['thresholds'][best]:.3f}")
+    print(f"   Hit ratio:  {curves['hit_ratio'][best]:.1%}")
+    print(f"   False hits: {curves['false_hit_rate'][best]:.1%}")
+    load_dotenv()
+    print(f"   Current threshold: {os.environ.get('CACHE_THRESHOLD', '0.1')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+rsearch_module.calibration
+
+Offline helpers for choosing the SemanticCache distance threshold.
+Distances use the same cosine distance Redis reports (1 - cosine similarity),
+so a threshold picked here can be passed straight to SemanticCache.
+"""
+import numpy as np
+
+
+def normalize(vectors):
+    """
+    Return a float32 copy of the given vectors scaled to unit length.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def pair_distances(vectors_a, vectors_b):
+    """
+    Cosine distance between row i of vectors_a and row i of vectors_b.
+    """
+    a = normalize(vectors_a)
+    b = normalize(vectors_b)
+    return 1.0 - np.einsum("ij,ij->i", a, b)
+
+
+def replay_hits(vectors, thresholds, block_size=1024):
+    """
+    Replay a query log against an initially empty cache, once per threshold.
+
+    Like get_cached_or_generate, a query is a hit if a stored query lies within
+    the threshold, and only misses are stored. Returns a (thresholds, queries)
+    boolean matrix. The first query is always a miss. Distances are computed
+    block by block, so no more than block_size x block_size of them are held
+    at once; only the hit/miss decisions inside a block are sequential.
+    """
+    unit = normalize(vectors)
+    thresholds = np.asarray(thresholds, dtype=np.float32)
+    count = len(unit)
+    hits = np.zeros((len(thresholds), count), dtype=bool)
+
+    for start in range(0, count, block_size):
+        stop = min(start + block_size, count)
+        block = unit[start:stop]
+
+        # Closest stored query before this block, per threshold
+        nearest = np.full((len(thresholds), stop - start), np.inf, dtype=np.float32)
+        for col_start in range(0, start, block_size):
+            col_stop = min(col_start + block_size, start)
+            distances = 1.0 - block @ unit[col_start:col_stop].T
+            for t in range(len(thresholds)):
+                stored = ~hits[t, col_start:col_stop]
+                if stored.any():
+                    nearest[t] = np.minimum(nearest[t], distances[:, stored].min(axis=1))
+
+        # Within the block, each decision depends on which earlier rows were stored
+        within = 1.0 - block @ block.T
+        for i in range(stop - start):
+            if i:
+                stored = ~hits[:, start:start + i]
+                nearest[:, i] = np.minimum(nearest[:, i], np.where(stored, within[i, :i], np.inf).min(axis=1))
+            hits[:, start + i] = nearest[:, i] <= thresholds
+
+    return hits
+
+
+def threshold_curves(thresholds, pair_dist, pair_labels, log_hits):
+    """
+    Evaluate each candidate threshold.
+
+    pair_labels is truthy for paraphrase pairs and log_hits comes from
+    replay_hits() with the same thresholds. For every threshold this reports
+    the hit ratio the query log would have seen, the share of non-paraphrase
+    pairs that would have been served a wrong cached answer (false hits), and
+    the share of paraphrase pairs that would have been matched.
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float32)
+    pair_dist = np.asarray(pair_dist, dtype=np.float32)
+    pair_labels = np.asarray(pair_labels, dtype=bool)
+    log_hits = np.asarray(log_hits, dtype=bool).reshape(len(thresholds), -1)
+
+    # Broadcast to a (thresholds, pairs) boolean "would hit" matrix
+    pair_hits = pair_dist[None, :] <= thresholds[:, None]
+
+    positives = max(int(pair_labels.sum()), 1)
+    negatives = max(int((~pair_labels).sum()), 1)
+
+    return {
+        "thresholds": thresholds,
+        "hit_ratio": log_hits.mean(axis=1) if log_hits.shape[1] else np.zeros(len(thresholds)),
+        "false_hit_rate": pair_hits[:, ~pair_labels].sum(axis=1) / negatives,
+        "paraphrase_recall": pair_hits[:, pair_labels].sum(axis=1) / positives,
+    }
+
+
+def recommend_threshold(curves, max_false_hit_rate=0.01):
+    """
+    Pick the threshold with the best hit ratio whose false-hit rate stays
+    within the budget. Ties go to the strictest threshold.
+
+    Returns the index into the curves, or None if even the strictest threshold
+    exceeds the budget.
+    """
+    safe = np.flatnonzero(curves["false_hit_rate"] <= max_false_hit_rate)
+    if len(safe) == 0:
+        return None
+    best = safe[np.argmax(curves["hit_ratio"][safe])]
+    return int(best)
@@ -0,0 +1,47 @@
+"""
+rsearch_module.embeddings
+
+Sentence embedding model shared by the cache service and the offline tools.
+Importing this module loads the model but needs no Redis or OpenAI configuration.
+"""
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from .profiling import span, traced
+
+# Use a model that produces 768-dimensional embeddings to match Redis cache configuration
+EMBEDDING_MODEL = 'sentence-transformers/all-mpnet-base-v2'
+
+embedder = SentenceTransformer(EMBEDDING_MODEL)
+# encode() calls self.tokenize(), so this splits tokenization from the forward pass in profiles
+embedder.tokenize = traced("tokenize", embedder.tokenize)
+
+
+def embed(text):
+    """
+    Generate an embedding for the given text using SentenceTransformer.
+    Returns a numpy array that can be safely converted to a list.
+    """
+    if not text:
+        raise ValueError("Text for embedding cannot be empty")
+
+    try:
+        # Get embedding and ensure it's a proper numpy array
+        with span("embed"):
+            embedding = embedder.encode([text])[0]
+        # Ensure it's a proper numpy array (not a weird subclass)
+        return np.array(embedding, dtype=np.float32)
+    except Exception as e:
+        print(f"Error generating embedding: {e}")
+        raise
+
+
+def embed_batch(texts, batch_size=64):
+    """
+    Generate embeddings for a list of texts in batches.
+    Returns a 2D float32 numpy array with one row per text.
+    """
+    if not texts:
+        raise ValueError("Texts for embedding cannot be empty")
+
+    embeddings = embedder.encode(list(texts), batch_size=batch_size, show_progress_bar=False)
+    return np.asarray(embeddings, dtype=np.float32)
@@ -0,0 +1,602 @@
+"""
+rsearch_module.local_index
+
+In-process (L1) semantic index that sits in front of the Redis SemanticCache.
+Vectors are stored unit-normalized so cosine distance is 1 - dot product,
+matching the distance Redis reports.
+
+With reduced_dims set, search runs in two stages: a coarse pass over
+PCA-projected vectors shortlists candidates, then an exact full-dimension
+rerank decides whether the best candidate is within distance_threshold.
+
+The index can be snapshotted to a directory of append-only segments and
+restored zero-copy with numpy.memmap. Each segment holds:
+  segment-NNNNN.vectors   contiguous float32 matrix, one row per entry
+  segment-NNNNN.data      UTF-8 JSON records with the response and metadata
+  segment-NNNNN.offsets   int64 byte offsets of each record in the .data file
+  segment-NNNNN.reduced   PCA-projected rows and their dot product with the
+  segment-NNNNN.mean_dot  PCA mean, when a projection has been fitted
+When the projection changes, projection-NNNNN.npz stores the PCA state and
+projection-NNNNN.reduced/.mean_dot the projected rows of earlier segments.
+manifest.json lists the segments in order and the current projection, which
+records the segments it covers so rows written by other processes are never
+matched against the wrong projected rows. Writers take an exclusive lock on
+snapshot.lock while updating the manifest. Restored files are opened read-only,
+so several worker processes share the same page cache. Superseded projection
+files are left for workers still using them.
+"""
+import bisect
+import collections
+import contextlib
+import json
+import os
+import threading
+import time
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = "snapshot.lock"
+# Rows processed per step when fitting or projecting, to bound temporary memory
+_CHUNK_ROWS = 4096
+
+# A restored, read-only segment; start is its first row in the index
+_Segment = collections.namedtuple("_Segment", ["start", "vectors", "offsets", "data"])
+
+
+class LocalSemanticIndex:
+    """
+    Append-only in-memory index of (vector, response, metadata) entries.
+    """
+
+    def __init__(self, dims=768, reduced_dims=None, shortlist=64, refit_every=2048, capacity=1024):
+        if reduced_dims is not None and not 0 < reduced_dims < dims:
+            raise ValueError("reduced_dims must be between 0 and dims")
+
+        self.dims = dims
+        self.reduced_dims = reduced_dims
+        self.shortlist = shortlist
+        # Refits wait for refit_every new rows (at least reduced_dims) and for the
+        # index to double since the last fit, so reprojection work stays
+        # proportional to n log n rather than n^2 / refit_every.
+        self.refit_every = max(refit_every, reduced_dims or 0)
+
+        self._lock = threading.Lock()
+        # Held by the one refit allowed to run at a time
+        self._refit_lock = threading.Lock()
+        # Held across a whole snapshot(): manifest read, segment write, manifest replace
+        self._snapshot_lock = threading.Lock()
+
+        # Rows [0, _base_size) live in restored segments, the rest in the in-memory tail
+        self._segments = []
+        self._base_size = 0
+        self._vectors = np.empty((capacity, dims), dtype=np.float32)
+        self._size = 0
+        self._responses = []
+        self._metadata = []
+
+        # (count, sum, scatter matrix) of fitted rows; PCA is refit exactly from these
+        self._moments = None
+        self._projection = None
+        # Projected base rows as (start row, reduced, mean_dot) blocks; the tail
+        # arrays are indexed like self._vectors
+        self._reduced_base = []
+        self._reduced = None
+        self._mean_dot = None
+        self._fitted_upto = 0
+        # Wall-clock duration of the most recent refit, for benchmarks and diagnostics
+        self.last_refit_ms = None
+
+        self._snapshot_dir = None
+        self._persisted_upto = 0
+        # Segment names holding rows [0, _persisted_upto), in this index's row order
+        self._persisted_segments = []
+        self._persisted_projection = None
+        self._persisted_projection_name = None
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def two_stage(self):
+        """True once the PCA projection has been fitted and coarse search is active."""
+        return self._projection is not None
+
+    def add(self, vector, response, metadata=None):
+        """
+        Store a vector with its cached response.
+        """
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if vector.shape[0] != self.dims:
+            raise ValueError(f"Vector has {vector.shape[0]} dimensions, index expects {self.dims}")
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+
+        with self._lock:
+            tail_size = self._size - self._base_size
+            if tail_size == len(self._vectors):
+                grown = np.empty((len(self._vectors) * 2, self.dims), dtype=np.float32)
+                grown[:tail_size] = self._vectors[:tail_size]
+                self._vectors = grown
+
+            self._vectors[tail_size] = vector
+            self._responses.append(response)
+            self._metadata.append(metadata or {})
+            self._size += 1
+
+            start_refit = False
+            if self.reduced_dims is not None:
+                if self._projection is not None:
+                    self._project_new_row(vector)
+                start_refit = self._size - self._fitted_upto >= max(self.refit_every, self._fitted_upto)
+
+        # Refit in the background so this add() and concurrent searches never wait on it
+        if start_refit:
+            self._start_background_refit()
+
+    def search(self, vector, distance_threshold):
+        """
+        Return (response, metadata, distance) for the nearest entry within
+        distance_threshold, or None.
+        """
+        # Capture consistent references; add() only replaces arrays, never shrinks them
+        with self._lock:
+            size = self._size
+            blocks = self._blocks()
+            projection = self._projection
+            reduced_blocks = self._reduced_blocks() if projection is not None else None
+
+        if size == 0:
+            return None
+
+        query = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        if projection is not None and size > self.shortlist:
+            candidates = self._coarse_candidates(query, projection, reduced_blocks)
+            distances = 1.0 - self._gather(blocks, candidates) @ query
+            best = int(np.argmin(distances))
+            index, distance = int(candidates[best]), float(distances[best])
+        else:
+            index, distance = -1, np.inf
+            for start, block in blocks:
+                if len(block) == 0:
+                    continue
+                distances = 1.0 - block @ query
+                best = int(np.argmin(distances))
+                if distances[best] < distance:
+                    index, distance = start + best, float(distances[best])
+
+        if distance > distance_threshold:
+            return None
+        response, metadata = self._entry(index)
+        return response, metadata, distance
+
+    def snapshot(self, path):
+        """
+        Write entries added since the last snapshot to `path` as a new segment.
+
+        Snapshotting to the directory this index was restored from, or last
+        snapshotted to, only appends a segment. Any other directory gets every
+        entry in one new segment. The PCA state and projected rows are saved
+        alongside, so restore() does not refit. Several processes may append
+        to one directory; a lock file serializes their manifest updates.
+        Returns the number of entries written.
+        """
+        path = os.path.abspath(path)
+
+        with self._snapshot_lock:
+            os.makedirs(path, exist_ok=True)
+            with self._lock:
+                size = self._size
+                blocks = self._blocks()
+                projection = self._projection
+                moments = self._moments
+                fitted_upto = self._fitted_upto
+                reduced_blocks = self._reduced_blocks() if projection is not None else None
+                appending = path == self._snapshot_dir
+                start = self._persisted_upto if appending else 0
+                persisted_segments = list(self._persisted_segments) if appending else []
+                persisted_projection = self._persisted_projection if appending else None
+                persisted_projection_name = self._persisted_projection_name if appending else None
+
+            with _directory_lock(path):
+                manifest = _read_manifest(path)
+                if manifest is not None and appending:
+                    if manifest["dims"] != self.dims:
+                        raise ValueError(f"Snapshot at {path} stores {manifest['dims']}-dim vectors")
+                    segments = manifest["segments"]
+                    projection_entry = manifest.get("projection")
+                else:
+                    segments = []
+                    projection_entry = None
+                next_number = 0
+                if manifest is not None:
+                    numbers = [segment["number"] for segment in manifest["segments"]]
+                    if manifest.get("projection"):
+                        numbers.append(manifest["projection"]["number"])
+                    next_number = max(numbers, default=-1) + 1
+
+                if projection is not None:
+                    reduced = [(row, block) for row, block, _ in reduced_blocks]
+                    mean_dot = [(row, block) for row, _, block in reduced_blocks]
+
+                # A new projection, or one another writer has replaced in the manifest,
+                # is saved with the projected rows of the segments this index holds
+                if projection is not None and (projection is not persisted_projection or projection_entry is None
+                                               or projection_entry["name"] != persisted_projection_name):
+                    name = f"projection-{next_number:05d}"
+                    prefix = os.path.join(path, name)
+                    count, total, scatter = moments
+                    np.savez(prefix + ".npz", mean=projection[0], components=projection[1],
+                             count=count, total=total, scatter=scatter)
+                    if start > 0:
+                        _write_rows(prefix + ".reduced", reduced, 0, start)
+                        _write_rows(prefix + ".mean_dot", mean_dot, 0, start)
+                    projection_entry = {"name": name, "number": next_number, "rows": start,
+                                        "segments": list(persisted_segments), "reduced_dims": self.reduced_dims,
+                                        "fitted_upto": fitted_upto}
+                    next_number += 1
+
+                count = size - start
+                if count > 0:
+                    name = f"segment-{next_number:05d}"
+                    prefix = os.path.join(path, name)
+                    self._write_segment(prefix, blocks, start, size)
+                    segment = {"name": name, "number": next_number, "count": count}
+                    if projection is not None:
+                        _write_rows(prefix + ".reduced", reduced, start, size)
+                        _write_rows(prefix + ".mean_dot", mean_dot, start, size)
+                        segment["projection"] = projection_entry["name"]
+                    segments.append(segment)
+                    persisted_segments.append(name)
+
+                manifest = {"dims": self.dims, "dtype": "float32", "segments": segments, "projection": projection_entry}
+                manifest_path = os.path.join(path, MANIFEST_FILE)
+                with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+                    json.dump(manifest, f)
+                os.replace(manifest_path + ".tmp", manifest_path)
+
+            with self._lock:
+                self._snapshot_dir = path
+                self._persisted_upto = size
+                self._persisted_segments = persisted_segments
+                self._persisted_projection = projection
+                self._persisted_projection_name = projection_entry["name"] if projection is not None else None
+        return count
+
+    @classmethod
+    def restore(cls, path, reduced_dims=None, shortlist=64, refit_every=2048):
+        """
+        Open a snapshot written by snapshot(). Vectors, records and projected
+        rows are memory-mapped read-only, so nothing is copied until it is searched.
+        With reduced_dims set, the saved PCA projection is reused; if the snapshot
+        has none of that size, one is fitted in the background.
+        """
+        path = os.path.abspath(path)
+        manifest = _read_manifest(path)
+        if manifest is None:
+            raise FileNotFoundError(f"No snapshot manifest in {path}")
+        if manifest["dtype"] != "float32":
+            raise ValueError(f"Snapshot at {path} stores {manifest['dtype']} vectors, expected float32")
+
+        index = cls(dims=manifest["dims"], reduced_dims=reduced_dims, shortlist=shortlist, refit_every=refit_every)
+        start = 0
+        for segment in manifest["segments"]:
+            prefix = os.path.join(path, segment["name"])
+            count = segment["count"]
+            index._segments.append(_Segment(
+                start=start,
+                vectors=np.memmap(prefix + ".vectors", dtype=np.float32, mode="r", shape=(count, index.dims)),
+                offsets=np.memmap(prefix + ".offsets", dtype=np.int64, mode="r", shape=(count + 1,)),
+                data=np.memmap(prefix + ".data", dtype=np.uint8, mode="r"),
+            ))
+            start += count
+
+        index._base_size = index._size = start
+        index._snapshot_dir = path
+        index._persisted_upto = start
+        index._persisted_segments = [segment["name"] for segment in manifest["segments"]]
+
+        if reduced_dims is not None:
+            projection_entry = manifest.get("projection")
+            if projection_entry is not None and projection_entry["reduced_dims"] == reduced_dims:
+                index._restore_projection(path, manifest["segments"], projection_entry)
+            if index._projection is None and start >= reduced_dims:
+                index._start_background_refit()
+        return index
+
+    def _restore_projection(self, path, segments, projection_entry):
+        """
+        Load the saved PCA state and memory-map the projected rows.
+        Leaves the index unprojected unless the projection file covers exactly
+        the leading segments it was written for, in manifest order, and every
+        later segment was saved with rows projected by it.
+        """
+        name = projection_entry["name"]
+        rows = projection_entry["rows"]
+        covered = projection_entry.get("segments")
+        if covered is None or [entry["name"] for entry in segments[:len(covered)]] != covered:
+            return
+        if sum(entry["count"] for entry in segments[:len(covered)]) != rows:
+            return
+        reduced_base = []
+        if rows > 0:
+            reduced_base.append((0,) + self._map_projected_rows(os.path.join(path, name), rows))
+        for entry, segment in zip(segments, self._segments):
+            if segment.start < rows:
+                continue
+            if entry.get("projection") != name:
+                return
+            reduced_base.append((segment.start,) + self._map_projected_rows(os.path.join(path, entry["name"]), entry["count"]))
+
+        with np.load(os.path.join(path, name + ".npz"), allow_pickle=False) as state:
+            self._projection = (state["mean"], state["components"])
+            self._moments = (int(state["count"]), state["total"], state["scatter"])
+        self._persisted_projection = self._projection
+        self._persisted_projection_name = name
+        self._reduced_base = reduced_base
+        self._reduced = np.empty((len(self._vectors), self.reduced_dims), dtype=np.float32)
+        self._mean_dot = np.empty(len(self._vectors), dtype=np.float32)
+        self._fitted_upto = projection_entry["fitted_upto"]
+
+    def _map_projected_rows(self, prefix, count):
+        """
+        Memory-map the .reduced and .mean_dot files at prefix read-only.
+        """
+        return (
+            np.memmap(prefix + ".reduced", dtype=np.float32, mode="r", shape=(count, self.reduced_dims)),
+            np.memmap(prefix + ".mean_dot", dtype=np.float32, mode="r", shape=(count,)),
+        )
+
+    def _blocks(self):
+        """
+        (start row, matrix) pairs covering every stored row. Called with the lock held.
+        """
+        blocks = [(segment.start, segment.vectors) for segment in self._segments]
+        blocks.append((self._base_size, self._vectors[:self._size - self._base_size]))
+        return blocks
+
+    def _reduced_blocks(self):
+        """
+        (start row, reduced, mean_dot) triples covering every stored row.
+        Called with the lock held while a projection is active.
+        """
+        tail_size = self._size - self._base_size
+        return self._reduced_base + [(self._base_size, self._reduced[:tail_size], self._mean_dot[:tail_size])]
+
+    def _gather(self, blocks, rows):
+        """
+        Collect the given global rows from the blocks as one float32 matrix.
+        """
+        starts = np.array([start for start, _ in blocks])
+        owners = np.searchsorted(starts, rows, side="right") - 1
+        gathered = np.empty((len(rows), self.dims), dtype=np.float32)
+        for owner in np.unique(owners):
+            mask = owners == owner
+            start, block = blocks[owner]
+            gathered[mask] = block[rows[mask] - start]
+        return gathered
+
+    def _entry(self, index):
+        """
+        Return (response, metadata) for a global row.
+        """
+        if index >= self._base_size:
+            return self._responses[index - self._base_size], self._metadata[index - self._base_size]
+
+        starts = [segment.start for segment in self._segments]
+        segment = self._segments[bisect.bisect_right(starts, index) - 1]
+        row = index - segment.start
+        record = json.loads(bytes(segment.data[segment.offsets[row]:segment.offsets[row + 1]]).decode("utf-8"))
+        return record["response"], record["metadata"]
+
+    def _write_segment(self, prefix, blocks, start, stop):
+        """
+        Write rows [start, stop) as a segment: vectors, records and record offsets.
+        """
+        _write_rows(prefix + ".vectors", blocks, start, stop)
+
+        offsets = np.zeros(stop - start + 1, dtype=np.int64)
+        with open(prefix + ".data", "wb") as f:
+            for i, row in enumerate(range(start, stop)):
+                response, metadata = self._entry(row)
+                record = json.dumps({"response": response, "metadata": metadata}).encode("utf-8")
+                f.write(record)
+                offsets[i + 1] = offsets[i] + len(record)
+        offsets.tofile(prefix + ".offsets")
+
+    def _coarse_candidates(self, query, projection, reduced_blocks):
+        """
+        Shortlist rows by approximate dot product in the reduced space.
+
+        With mean m and projections p(.), q.x ~= p(q).p(x) + x.m + const,
+        so ranking by p(q).p(x) + x.m approximates ranking by cosine.
+        """
+        mean, components = projection
+        projected_query = (query - mean) @ components.T
+        scores = np.concatenate([reduced @ projected_query + mean_dot for _, reduced, mean_dot in reduced_blocks])
+        count = min(self.shortlist, len(scores))
+        return np.argpartition(-scores, count - 1)[:count]
+
+    def refit(self):
+        """
+        Fold vectors added since the last fit into the PCA and reproject
+        every stored vector. Blocks until done; searches and adds keep running
+        meanwhile and see the new projection once it is swapped in.
+        """
+        with self._refit_lock:
+            self._refit()
+
+    def _start_background_refit(self):
+        """
+        Start a refit thread unless one is already running.
+        """
+        if self._refit_lock.acquire(blocking=False):
+            threading.Thread(target=self._refit_in_background, daemon=True).start()
+
+    def _refit_in_background(self):
+        """
+        Thread target for background refits. The caller acquired _refit_lock.
+        """
+        try:
+            self._refit()
+        finally:
+            self._refit_lock.release()
+
+    def _refit(self):
+        """
+        Fit and reproject outside self._lock, then swap the results in.
+        Called with _refit_lock held, so only one refit runs at a time.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            size = self._size
+            blocks = self._blocks()
+            fitted_upto = self._fitted_upto
+            moments = self._moments
+            base_size = self._base_size
+            capacity = len(self._vectors)
+        if size - fitted_upto < self.reduced_dims:
+            return
+
+        # Accumulate running moments of the new rows. NumPy matmul and eigh release
+        # the GIL, so request threads keep running while this computes.
+        if moments is None:
+            moments = (0, np.zeros(self.dims), np.zeros((self.dims, self.dims)))
+        count, total, scatter = moments
+        for start in range(fitted_upto, size, _CHUNK_ROWS):
+            for _, rows in _iter_rows(blocks, start, min(start + _CHUNK_ROWS, size)):
+                rows = rows.astype(np.float64)
+                count += len(rows)
+                total = total + rows.sum(axis=0)
+                scatter = scatter + rows.T @ rows
+
+        # Top principal components are the leading eigenvectors of the covariance
+        mean = total / count
+        _, eigenvectors = np.linalg.eigh(scatter / count - np.outer(mean, mean))
+        components = eigenvectors[:, ::-1][:, :self.reduced_dims].T.astype(np.float32)
+        projection = (mean.astype(np.float32), components)
+
+        # Restored rows are reprojected into memory; the tail keeps the layout of self._vectors
+        reduced_base = []
+        if base_size > 0:
+            reduced = np.empty((base_size, self.reduced_dims), dtype=np.float32)
+            mean_dot = np.empty(base_size, dtype=np.float32)
+            _project_rows(blocks, 0, base_size, projection, reduced, mean_dot, 0)
+            reduced_base.append((0, reduced, mean_dot))
+        reduced = np.empty((capacity, self.reduced_dims), dtype=np.float32)
+        mean_dot = np.empty(capacity, dtype=np.float32)
+        _project_rows(blocks, base_size, size, projection, reduced, mean_dot, base_size)
+
+        with self._lock:
+            # Rows added while fitting are projected here; there are only a few
+            if len(self._vectors) > capacity:
+                reduced = _grow(reduced, len(self._vectors), size - base_size)
+                mean_dot = _grow(mean_dot, len(self._vectors), size - base_size)
+            _project_rows(self._blocks(), size, self._size, projection, reduced, mean_dot, base_size)
+            self._moments = (count, total, scatter)
+            self._projection = projection
+            self._reduced_base = reduced_base
+            self._reduced = reduced
+            self._mean_dot = mean_dot
+            self._fitted_upto = size
+        self.last_refit_ms = (time.perf_counter() - started) * 1000
+
+    def _project_new_row(self, vector):
+        """
+        Project one newly added tail row with the current PCA. Called with the lock held.
+        """
+        row = self._size - 1 - self._base_size
+        if row >= len(self._reduced):
+            self._reduced = _grow(self._reduced, len(self._vectors), row)
+            self._mean_dot = _grow(self._mean_dot, len(self._vectors), row)
+        mean, components = self._projection
+        self._reduced[row] = (vector - mean) @ components.T
+        self._mean_dot[row] = vector @ mean
+
+
+def _iter_rows(blocks, start, stop):
+    """
+    Yield (row, array) slices covering global rows [start, stop) across
+    (start row, array) blocks.
+    """
+    for block_start, block in blocks:
+        block_stop = block_start + len(block)
+        if block_stop <= start or block_start >= stop:
+            continue
+        lo = max(start, block_start)
+        hi = min(stop, block_stop)
+        yield lo, block[lo - block_start:hi - block_start]
+
+
+def _project_rows(blocks, start, stop, projection, reduced, mean_dot, offset):
+    """
+    Project global rows [start, stop) into reduced and mean_dot at
+    row - offset, in bounded chunks.
+    """
+    mean, components = projection
+    for chunk_start in range(start, stop, _CHUNK_ROWS):
+        for row, rows in _iter_rows(blocks, chunk_start, min(chunk_start + _CHUNK_ROWS, stop)):
+            reduced[row - offset:row - offset + len(rows)] = (rows - mean) @ components.T
+            mean_dot[row - offset:row - offset + len(rows)] = rows @ mean
+
+
+def _grow(array, capacity, used):
+    """
+    Return a copy of array with capacity rows, keeping the first `used`.
+    """
+    grown = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:used] = array[:used]
+    return grown
+
+
+def _write_rows(path, blocks, start, stop):
+    """
+    Write global rows [start, stop) of (start row, array) blocks to a raw float32 file.
+    """
+    out = np.memmap(path, dtype=np.float32, mode="w+", shape=(stop - start,) + blocks[0][1].shape[1:])
+    for row, rows in _iter_rows(blocks, start, stop):
+        out[row - start:row - start + len(rows)] = rows
+    out.flush()
+    del out
+
+
+@contextlib.contextmanager
+def _directory_lock(path):
+    """
+    Hold an exclusive lock on the snapshot directory's lock file, across processes.
+    """
+    with open(os.path.join(path, LOCK_FILE), "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _read_manifest(path):
+    """
+    Load a snapshot manifest, or return None if the directory has none.
+    """
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,243 @@
+"""
+rsearch_module.profiling
+
+Opt-in request profiling for the query hot path.
+
+A RequestProfiler decides per request whether to profile (a sampled fraction
+of query requests, or any request whose debug header carries the configured
+token). A profiled request records a cProfile or statistical stack profile
+plus timed spans for each stage (embedding, tokenization, L1 search, Redis,
+LLM). The slowest profiles are kept in memory for download.
+
+When a request is not profiled, span() costs one context variable lookup.
+"""
+import cProfile
+import collections
+import contextlib
+import contextvars
+import functools
+import heapq
+import hmac
+import io
+import itertools
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+
+_current = contextvars.ContextVar("rsearch_profile", default=None)
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def span(name):
+    """
+    Context manager timing one stage of the current profiled request.
+    Does nothing when the current request is not being profiled.
+    """
+    profile = _current.get()
+    if profile is None:
+        return _NULL_SPAN
+    return profile.span(name)
+
+
+def traced(name, func):
+    """
+    Wrap func so each call is recorded as a span.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with span(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class _StackSampler(threading.Thread):
+    """
+    Samples one thread's Python stack at a fixed interval and counts
+    collapsed stacks ("outer;inner;leaf"), the format flame graph tools read.
+    """
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+class _ActiveProfile:
+    """
+    State for one request while it is being profiled.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans = []
+        self._depth = 0
+
+    @contextlib.contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        depth = self._depth
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            self.spans.append({
+                "name": name,
+                "depth": depth,
+                "start_ms": (start - self.start) * 1000,
+                "duration_ms": (time.perf_counter() - start) * 1000
+            })
+
+
+class RequestProfiler:
+    """
+    Samples requests for profiling and keeps the slowest `keep` profiles.
+
+    mode is "cprofile" (deterministic, higher overhead) or "sample"
+    (statistical stack sampling every sample_interval seconds).
+    On-demand profiling via the header is only enabled when token is set,
+    and the header value must match it.
+    """
+
+    def __init__(self, sample_rate=0.0, header="X-Debug-Profile", keep=20, mode="cprofile", sample_interval=0.005,
+                 token=None):
+        if mode not in ("cprofile", "sample"):
+            raise ValueError("mode must be 'cprofile' or 'sample'")
+        if keep < 1:
+            raise ValueError("keep must be at least 1")
+        self.sample_rate = sample_rate
+        self.header = header
+        self.keep = keep
+        self.mode = mode
+        self.sample_interval = sample_interval
+        self.token = token
+
+        self._lock = threading.Lock()
+        self._heap = []  # (duration, id, record), smallest duration first
+        self._ids = itertools.count(1)
+
+    def authorized(self, headers):
+        """
+        True if the debug header carries the configured token.
+        Always False when no token is configured.
+        """
+        if not self.token or not self.header:
+            return False
+        value = headers.get(self.header)
+        if not value:
+            return False
+        return hmac.compare_digest(value.encode("utf-8"), self.token.encode("utf-8"))
+
+    def should_profile(self, headers, sampled=True):
+        """
+        True if the request carries the debug header with the token, or is sampled.
+        Pass sampled=False for requests that are only profiled on demand.
+        """
+        if self.authorized(headers):
+            return True
+        return sampled and self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self, label):
+        """
+        Begin profiling the current request. Returns a handle for finish().
+        """
+        profile = _ActiveProfile()
+        collector = None
+        if self.mode == "cprofile":
+            collector = cProfile.Profile()
+            try:
+                collector.enable()
+            except ValueError:
+                # Another profiler is already active (e.g. a concurrent request); keep spans only
+                collector = None
+        else:
+            collector = _StackSampler(threading.get_ident(), self.sample_interval)
+            collector.start()
+        token = _current.set(profile)
+        return label, profile, collector, token
+
+    def finish(self, handle):
+        """
+        Stop profiling and store the result if it is among the slowest.
+        """
+        label, profile, collector, token = handle
+        duration_ms = (time.perf_counter() - profile.start) * 1000
+        _current.reset(token)
+
+        report, raw = "", None
+        if isinstance(collector, cProfile.Profile):
+            collector.disable()
+            collector.create_stats()
+            raw = marshal.dumps(collector.stats)
+            out = io.StringIO()
+            pstats.Stats(collector, stream=out).sort_stats("cumulative").print_stats(40)
+            report = out.getvalue()
+        elif isinstance(collector, _StackSampler):
+            collector.stop()
+            report = "\n".join(f"{stack} {count}" for stack, count in collector.stacks.most_common())
+
+        # Time not covered by any top-level span: web framework, serialization, etc.
+        accounted = sum(s["duration_ms"] for s in profile.spans if s["depth"] == 0)
+        record = {
+            "id": next(self._ids),
+            "label": label,
+            "mode": self.mode if collector is not None else "spans",
+            "timestamp": time.strftime("%H:%M:%S"),
+            "duration_ms": duration_ms,
+            "spans": sorted(profile.spans, key=lambda s: s["start_ms"]),
+            "unaccounted_ms": max(duration_ms - accounted, 0.0),
+            "report": report,
+            "raw": raw
+        }
+
+        with self._lock:
+            entry = (duration_ms, record["id"], record)
+            if len(self._heap) < self.keep:
+                heapq.heappush(self._heap, entry)
+            elif duration_ms > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+        return record
+
+    def profiles(self):
+        """
+        Stored profiles, slowest first, without the raw profile data.
+        """
+        with self._lock:
+            records = [record for _, _, record in sorted(self._heap, reverse=True)]
+        return [{k: v for k, v in record.items() if k not in ("report", "raw")} for record in records]
+
+    def get(self, profile_id):
+        """
+        Return the stored profile with the given id, or None.
+        """
+        with self._lock:
+            for _, _, record in self._heap:
+                if record["id"] == profile_id:
+                    return record
+        return None
+
+    def clear(self):
+        """Drop all stored profiles."""
+        with self._lock:
+            self._heap = []
@@ -0,0 +1,420 @@
+"""
+rsearch_module.service
+
+Semantic cache service: connects to Redis and OpenAI at import time and provides
+methods for querying the LLM and caching results in Redis.
+"""
+import os
+import threading
+import time
+from redisvl.utils.vectorize import HFTextVectorizer
+from openai import OpenAI
+from dotenv import load_dotenv
+from .embeddings import EMBEDDING_MODEL, embedder, embed, embed_batch
+from .local_index import LocalSemanticIndex
+from .sharding import CacheNamespace, ShardedSemanticCache
+from .profiling import RequestProfiler, span
+
+# Public names, re-exported lazily by the package (rsearch_module._SERVICE_NAMES);
+# embed and embed_batch are listed so `from rsearch_module import embed_batch` keeps working
+__all__ = [
+    "RDS_URI", "OPENAI_API_KEY", "RDS_URIS", "CACHE_THRESHOLD", "NAMESPACE_THRESHOLDS",
+    "DEFAULT_MODEL", "DEFAULT_TEMPERATURE", "DEFAULT_MAX_TOKENS", "DEFAULT_TENANT",
+    "ALLOWED_MODELS", "ALLOWED_TENANTS", "MAX_TOKENS_LIMIT", "MAX_NAMESPACES", "L1_CACHE",
+    "L1_REDUCED_DIMS", "L1_SHORTLIST", "L1_SNAPSHOT_DIR", "openai_client", "cache", "local_indexes",
+    "profiler", "EMBEDDING_MODEL", "embedder", "embed", "embed_batch", "check_openai_status",
+    "make_namespace", "get_local_index", "get_distance_threshold", "snapshot_local_index",
+    "llm_query_with_retry", "llm_query", "get_cached_or_generate"
+]
+
+# Connect to Redis Cloud (replace with your credentials)
+load_dotenv()  # Loads variables from a .env file into environment
+
+RDS_URI = os.environ.get("RDS_URI")  # Make sure to add RDS_URI=<your_redis_url> to your .env file
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")  # Make sure to add your OpenAI API key
+# Optional: comma-separated Redis URLs; cache namespaces are sharded across them by consistent hashing
+RDS_URIS = [url.strip() for url in os.environ.get("RDS_URIS", "").split(",") if url.strip()] or [RDS_URI]
+
+if not RDS_URIS[0]:
+    raise ValueError("RDS_URI environment variable not set")
+
+if not OPENAI_API_KEY:
+    raise ValueError("OPENAI_API_KEY environment variable not set")
+
+# Default semantic distance threshold, plus optional per-namespace overrides.
+# CACHE_NAMESPACE_THRESHOLDS format: "support=0.15,code=0.05"
+# Use calibrate_threshold.py to pick values from labeled data.
+CACHE_THRESHOLD = float(os.environ.get("CACHE_THRESHOLD", "0.1"))
+NAMESPACE_THRESHOLDS = {}
+for _entry in os.environ.get("CACHE_NAMESPACE_THRESHOLDS", "").split(","):
+    if "=" in _entry:
+        _name, _value = _entry.split("=", 1)
+        NAMESPACE_THRESHOLDS[_name.strip()] = float(_value)
+
+# Default generation parameters; each distinct combination gets its own cache namespace
+DEFAULT_MODEL = "gpt-4o-mini"
+DEFAULT_TEMPERATURE = 0.7
+DEFAULT_MAX_TOKENS = 500
+DEFAULT_TENANT = "default"
+
+# Clients may only pick from these; each distinct combination creates a Redis index and an L1 index.
+# ALLOWED_TENANTS defaults to the default tenant plus those with a configured threshold.
+ALLOWED_MODELS = {m.strip() for m in os.environ.get("ALLOWED_MODELS", DEFAULT_MODEL).split(",") if m.strip()}
+ALLOWED_TENANTS = ({t.strip() for t in os.environ.get("ALLOWED_TENANTS", "").split(",") if t.strip()}
+                   or {DEFAULT_TENANT, *NAMESPACE_THRESHOLDS})
+MAX_TOKENS_LIMIT = int(os.environ.get("MAX_TOKENS_LIMIT", "1000"))
+# Backstop on the number of namespaces held at once; further namespaces are served uncached
+MAX_NAMESPACES = int(os.environ.get("MAX_NAMESPACES", "100"))
+
+# Initialize OpenAI client
+openai_client = OpenAI(api_key=OPENAI_API_KEY)
+
+# Initialize the sharded cache; per-namespace indexes are created on first use
+try:
+    cache = ShardedSemanticCache(
+        redis_urls=RDS_URIS,
+        distance_threshold=CACHE_THRESHOLD,  # Adjust for strictness of semantic similarity
+        # One shared vectorizer matching the embedder's 768 dimensions, instead of one per namespace
+        vectorizer=HFTextVectorizer(model=EMBEDDING_MODEL),
+        default_namespace=CacheNamespace(DEFAULT_TENANT, DEFAULT_MODEL, DEFAULT_TEMPERATURE, DEFAULT_MAX_TOKENS),
+        max_namespaces=MAX_NAMESPACES
+    )
+except Exception as e:
+    print(f"Warning: Error initializing cache: {e}")
+    # If cache initialization fails, we'll create a fallback later
+    cache = None
+
+# Optional in-process L1 indexes in front of Redis, one per cache namespace.
+# L1_REDUCED_DIMS enables two-stage search (PCA coarse pass + exact rerank).
+# L1_SNAPSHOT_DIR restores each namespace's index from <dir>/<index name> on first use.
+L1_CACHE = os.environ.get("L1_CACHE", "").lower() in ("1", "true", "yes")
+L1_REDUCED_DIMS = int(os.environ.get("L1_REDUCED_DIMS", "0")) or None
+L1_SHORTLIST = int(os.environ.get("L1_SHORTLIST", "64"))
+L1_SNAPSHOT_DIR = os.environ.get("L1_SNAPSHOT_DIR")
+
+local_indexes = {}
+_local_indexes_lock = threading.Lock()
+
+# Opt-in request profiling. PROFILE_SAMPLE_RATE profiles a fraction of /api/query
+# requests; a request whose PROFILE_HEADER header equals PROFILE_TOKEN is always profiled.
+# The same header and token guard the /api/admin routes; without PROFILE_TOKEN they are disabled.
+profiler = RequestProfiler(
+    sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", "0")),
+    header=os.environ.get("PROFILE_HEADER", "X-Debug-Profile"),
+    keep=int(os.environ.get("PROFILE_KEEP", "20")),
+    mode=os.environ.get("PROFILE_MODE", "cprofile"),
+    sample_interval=float(os.environ.get("PROFILE_SAMPLE_INTERVAL_MS", "5")) / 1000,
+    token=os.environ.get("PROFILE_TOKEN") or None
+)
+
+def check_openai_status():
+    """
+    Check if OpenAI API is accessible and return status information.
+    """
+    try:
+        # Try a minimal API call to check status
+        response = openai_client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": "Hello"}],
+            max_tokens=5
+        )
+
+        if not response or not response.choices:
+            return {"status": "error", "message": "No response from OpenAI API"}
+        
+        return {"status": "ok", "message": "OpenAI API is accessible"}
+    except Exception as e:
+        error_str = str(e)
+        if "insufficient_quota" in error_str or "429" in error_str:
+            return {
+                "status": "quota_exceeded", 
+                "message": "Quota exceeded. Please check your OpenAI billing.",
+                "action_url": "https://platform.openai.com/settings/organization/billing"
+            }
+        elif "rate_limit" in error_str:
+            return {"status": "rate_limited", "message": "Rate limit exceeded. Please wait."}
+        elif "authentication" in error_str or "401" in error_str:
+            return {"status": "auth_error", "message": "Invalid API key. Check your OPENAI_API_KEY."}
+        else:
+            return {"status": "error", "message": f"API Error: {e}"}
+
+def make_namespace(namespace=None, model=DEFAULT_MODEL, temperature=DEFAULT_TEMPERATURE, max_tokens=DEFAULT_MAX_TOKENS):
+    """
+    Build the cache namespace for a tenant and its generation parameters.
+    Raises ValueError for a tenant or model that is not allowed, or parameters
+    out of range. Values are normalized (e.g. temperature 1 -> 1.0) so equal
+    settings always map to the same namespace and index.
+    """
+    tenant = namespace or DEFAULT_TENANT
+    if not isinstance(tenant, str) or tenant not in ALLOWED_TENANTS:
+        raise ValueError(f"Unknown namespace: {tenant!r}")
+    if not isinstance(model, str) or model not in ALLOWED_MODELS:
+        raise ValueError(f"Model not allowed: {model!r}")
+    if isinstance(temperature, bool) or not isinstance(temperature, (int, float)) or not 0 <= temperature <= 2:
+        raise ValueError("temperature must be a number between 0 and 2")
+    if isinstance(max_tokens, float) and max_tokens.is_integer():
+        max_tokens = int(max_tokens)
+    if isinstance(max_tokens, bool) or not isinstance(max_tokens, int) or not 1 <= max_tokens <= MAX_TOKENS_LIMIT:
+        raise ValueError(f"max_tokens must be an integer between 1 and {MAX_TOKENS_LIMIT}")
+    return CacheNamespace(str(tenant), str(model), float(temperature), int(max_tokens))
+
+def get_local_index(cache_namespace):
+    """
+    Return the L1 index for a cache namespace, restoring it from
+    L1_SNAPSHOT_DIR on first use. Returns None when L1 is disabled.
+    """
+    if not L1_CACHE:
+        return None
+
+    local_index = local_indexes.get(cache_namespace)
+    if local_index is not None:
+        return local_index
+
+    with _local_indexes_lock:
+        local_index = local_indexes.get(cache_namespace)
+        if local_index is None and len(local_indexes) >= MAX_NAMESPACES:
+            print(f"Warning: {MAX_NAMESPACES} L1 indexes already open, skipping L1 for {cache_namespace.key}")
+            return None
+        if local_index is None:
+            dims = embedder.get_sentence_embedding_dimension()
+            snapshot_dir = _local_snapshot_dir(cache_namespace)
+            if snapshot_dir and os.path.exists(os.path.join(snapshot_dir, "manifest.json")):
+                try:
+                    local_index = LocalSemanticIndex.restore(snapshot_dir, reduced_dims=L1_REDUCED_DIMS, shortlist=L1_SHORTLIST)
+                    print(f"Restored {len(local_index)} L1 entries from {snapshot_dir}")
+                except Exception as e:
+                    print(f"Warning: Error restoring L1 snapshot: {e}")
+            # A snapshot from a different embedding model would fail every search and add
+            if local_index is not None and local_index.dims != dims:
+                print(f"Warning: L1 snapshot in {snapshot_dir} has {local_index.dims}-dim vectors, "
+                      f"embedder produces {dims}; starting empty")
+                local_index = None
+            if local_index is None:
+                local_index = LocalSemanticIndex(
+                    dims=dims,
+                    reduced_dims=L1_REDUCED_DIMS,
+                    shortlist=L1_SHORTLIST,
+                    capacity=256  # grows by doubling; keeps rarely used namespaces small
+                )
+            local_indexes[cache_namespace] = local_index
+    return local_index
+
+def _local_snapshot_dir(cache_namespace, root=None):
+    """
+    Snapshot directory for a namespace's L1 index, named after its Redis index.
+    """
+    root = root or L1_SNAPSHOT_DIR
+    if not root or cache is None:
+        return None
+    return os.path.join(root, cache.index_name(cache_namespace))
+
+def _add_to_local_index(local_index, embedding, response):
+    """
+    Add a response to the L1 index, if enabled. Failures are only logged,
+    so they never turn a cache hit or a fresh LLM answer into another LLM call.
+    """
+    if local_index is None:
+        return
+    try:
+        local_index.add(embedding, response)
+    except Exception as e:
+        print(f"L1 cache store error: {e}")
+
+def get_distance_threshold(namespace=None):
+    """
+    Return the distance threshold for the given namespace,
+    falling back to the global CACHE_THRESHOLD.
+    """
+    return NAMESPACE_THRESHOLDS.get(namespace, CACHE_THRESHOLD)
+
+def snapshot_local_index(path=None):
+    """
+    Append L1 entries added since the last snapshot to the snapshot directory,
+    one subdirectory per namespace. Returns the number of entries written.
+    """
+    if not L1_CACHE:
+        raise ValueError("L1 index is not enabled (set L1_CACHE=true)")
+    if not (path or L1_SNAPSHOT_DIR):
+        raise ValueError("No snapshot directory given and L1_SNAPSHOT_DIR not set")
+    if cache is None:
+        raise ValueError("Cache not available - cannot name namespace snapshots")
+
+    written = 0
+    for cache_namespace, local_index in list(local_indexes.items()):
+        written += local_index.snapshot(_local_snapshot_dir(cache_namespace, path))
+    return written
+
+def llm_query_with_retry(prompt, max_retries=3, retry_delay=2, model=DEFAULT_MODEL,
+                         temperature=DEFAULT_TEMPERATURE, max_tokens=DEFAULT_MAX_TOKENS):
+    """
+    Query the LLM with retry logic for rate limits.
+    """
+    for attempt in range(max_retries):
+        try:
+            response = openai_client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            error_str = str(e)
+
+            # Don't retry on quota exceeded or auth errors
+            if "insufficient_quota" in error_str or "authentication" in error_str:
+                raise e
+
+            # Retry on rate limits
+            if "rate_limit" in error_str and attempt < max_retries - 1:
+                print(f"⏳ Rate limited. Retrying in {retry_delay} seconds... (Attempt {attempt + 1}/{max_retries})")
+                time.sleep(retry_delay)
+                retry_delay *= 2  # Exponential backoff
+                continue
+            # Re-raise the exception if max retries reached
+            raise e
+        
+def llm_query(prompt, model=DEFAULT_MODEL, temperature=DEFAULT_TEMPERATURE, max_tokens=DEFAULT_MAX_TOKENS):
+    """
+    Query the LLM with the given prompt using the new OpenAI client.
+    Includes enhanced error handling for quota issues.
+    """
+    try:
+        response = openai_client.chat.completions.create(
+            model=model,  # Defaults to a more cost-effective model
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+
+        if not response or not response.choices:
+            return {"status": "error", "message": "No response from OpenAI API"}
+        return response.choices[0].message.content
+    except Exception as e:
+        error_str = str(e)
+
+        # Handle specific quota exceeded error
+        if "insufficient_quota" in error_str or "429" in error_str:
+            print("⚠️  OpenAI API Quota Exceeded!")
+            print("🔧 To fix this issue:")
+            print("   1. Check your OpenAI billing at: https://platform.openai.com/settings/organization/billing")
+            print("   2. Add credits or upgrade your plan")
+            print("   3. Ensure your payment method is valid")
+            print("   4. Check usage limits in your dashboard")
+            return f"[QUOTA_EXCEEDED] Unable to generate response for: '{prompt[:50]}...' - Please check your OpenAI billing."
+        
+        # Handle rate limit errors
+        elif "rate_limit" in error_str:
+            print("⚠️  OpenAI API Rate Limit Exceeded!")
+            print("💡 Try again in a few seconds...")
+            return f"[RATE_LIMITED] Please try again later for: '{prompt[:50]}...'"
+        
+        # Handle authentication errors
+        elif "authentication" in error_str or "401" in error_str:
+            print("⚠️  OpenAI API Authentication Error!")
+            print("🔧 Check your OPENAI_API_KEY in the .env file")
+            return f"[AUTH_ERROR] Invalid API key for: '{prompt[:50]}...'"
+        
+        # Generic error handling
+        else:
+            print(f"❌ OpenAI API error: {e}")
+            return f"[API_ERROR] Mock response for: '{prompt[:50]}...' (OpenAI API not available)"
+
+def get_cached_or_generate(prompt, namespace=None, model=DEFAULT_MODEL,
+                           temperature=DEFAULT_TEMPERATURE, max_tokens=DEFAULT_MAX_TOKENS):
+    """
+    Checks the semantic cache for the given prompt; 
+    if not found, generates a response using LLM with enhanced error handling.
+    The namespace (tenant) and generation parameters select the cache namespace,
+    so answers generated with different settings are never mixed. The namespace
+    also selects a per-namespace distance threshold, if one is configured.
+    Raises ValueError if make_namespace() rejects the namespace or parameters.
+    """
+    threshold = get_distance_threshold(namespace)
+    cache_namespace = make_namespace(namespace, model, temperature, max_tokens)
+    generation = {"model": cache_namespace.model, "temperature": cache_namespace.temperature,
+                  "max_tokens": cache_namespace.max_tokens}
+    local_index = get_local_index(cache_namespace)
+    embedding = None
+
+    # Check the in-process L1 index first, if enabled
+    if local_index is not None:
+        try:
+            embedding = embed(prompt)
+            with span("l1_search"):
+                local_hit = local_index.search(embedding, threshold)
+            if local_hit:
+                print("L1 cache hit!")
+                return local_hit[0]
+        except Exception as e:
+            print(f"L1 cache check error: {e}")
+
+    # Only try cache if it's properly initialized
+    if cache is not None:
+        try:
+            if embedding is None:
+                embedding = embed(prompt)
+            with span("redis_check"):
+                cached = cache.cache_for(cache_namespace).check(
+                    prompt,
+                    embedding.tolist(),
+                    distance_threshold=threshold
+                )
+            if cached:
+                print("Cache hit!")
+                # Handle different return types from cache
+                if isinstance(cached, list) and len(cached) > 0:
+                    response = cached[0].get('response', cached[0]) if isinstance(cached[0], dict) else str(cached[0])
+                elif hasattr(cached, 'response'):
+                    response = cached.response
+                else:
+                    response = str(cached)
+                # Warm the L1 index so the next similar prompt skips Redis
+                _add_to_local_index(local_index, embedding, response)
+                return response
+        except Exception as e:
+            print(f"Cache check error: {e}")
+
+    # Cache miss or cache unavailable - fetch from LLM
+    print("Cache miss or unavailable, calling LLM...")
+    try:
+        if embedding is None:
+            embedding = embed(prompt)
+        # Try with retry logic first, fall back to basic query if needed
+        with span("llm"):
+            try:
+                result = llm_query_with_retry(prompt, **generation)
+            except Exception as retry_error:
+                print(f"Retry logic failed: {retry_error}")
+                result = llm_query(prompt, **generation)
+
+        # Store in cache only if cache is available - convert numpy array to list to avoid boolean evaluation issues
+        if cache is not None:
+            try:
+                # Convert numpy array to list to avoid "ambiguous truth value" error
+                embedding_list = embedding.tolist() if hasattr(embedding, 'tolist') else embedding
+                with span("redis_store"):
+                    cache.cache_for(cache_namespace).store(prompt, result, embedding_list)
+                print("Result stored in cache successfully!")
+            except Exception as store_error:
+                error_msg = str(store_error)
+                if "Invalid vector dimensions" in error_msg or "Vector dims must be equal" in error_msg:
+                    print(f"⚠️  Vector dimension mismatch: {store_error}")
+                    print("💡 Consider clearing the Redis cache or using a different embedder model")
+                    print(f"   Current embedder produces {len(embedding_list) if hasattr(embedding, 'tolist') else 'unknown'} dimensions")
+                else:
+                    print(f"Error storing in cache: {store_error}")
+                # Continue execution even if caching fails
+        else:
+            print("Cache not available - result not cached")
+
+        _add_to_local_index(local_index, embedding, result)
+
+        return result
+    except Exception as e:
+        print(f"Error in cache miss handling: {e}")
+        # Return the result even if caching fails
+        try:
+            return llm_query_with_retry(prompt, **generation)
+        except Exception:
+            return llm_query(prompt, **generation)
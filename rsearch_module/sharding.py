@@ -0,0 +1,115 @@
+"""
+rsearch_module.sharding
+
+Cache namespaces and consistent-hash routing of namespaces across Redis nodes.
+
+A namespace is a tenant plus the generation parameters (model, temperature,
+max_tokens) so answers generated with different settings are never mixed.
+Each namespace gets its own SemanticCache index on the node chosen by a
+consistent hash ring, which keeps per-namespace KNN searches small and lets
+nodes be added with only a fraction of namespaces moving.
+"""
+import bisect
+import collections
+import hashlib
+import re
+import threading
+import redis
+from redisvl.extensions.llmcache import SemanticCache
+
+DEFAULT_INDEX_NAME = "llmcache"
+
+
+class CacheNamespace(collections.namedtuple("CacheNamespace", ["tenant", "model", "temperature", "max_tokens"])):
+    """
+    Identifies a cache namespace: a tenant and its generation parameters.
+    Build it with normalized types (str, str, float, int): 1 == 1.0 hash alike
+    but would give different keys.
+    """
+
+    @property
+    def key(self):
+        """Stable string key used for routing and index naming."""
+        return f"{self.tenant}|{self.model}|{self.temperature}|{self.max_tokens}"
+
+
+def _hash(value):
+    """64-bit position on the hash ring."""
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class ConsistentHashRing:
+    """
+    Maps keys to nodes; each node owns `replicas` virtual points on the ring.
+    """
+
+    def __init__(self, nodes, replicas=100):
+        if not nodes:
+            raise ValueError("At least one node is required")
+        points = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def get_node(self, key):
+        """Return the node owning the given key."""
+        position = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._nodes[position]
+
+
+class ShardedSemanticCache:
+    """
+    Routes each namespace to a Redis node and lazily creates its SemanticCache.
+    Each node has its own client and connection pool, shared by the
+    namespaces routed to it. At most max_namespaces caches are created, so
+    client input cannot create an unbounded number of Redis indexes.
+    """
+
+    def __init__(self, redis_urls, distance_threshold, vectorizer=None, default_namespace=None, replicas=100,
+                 max_namespaces=None):
+        self.redis_urls = list(redis_urls)
+        self.distance_threshold = distance_threshold
+        self.vectorizer = vectorizer
+        # The default namespace keeps the original single index name so existing entries stay reachable
+        self.default_namespace = default_namespace
+        self.max_namespaces = max_namespaces
+        self._ring = ConsistentHashRing(self.redis_urls, replicas=replicas)
+        self._clients = {}
+        self._caches = {}
+        self._lock = threading.Lock()
+
+    def node_for(self, namespace):
+        """Return the Redis URL that owns the namespace."""
+        return self._ring.get_node(namespace.key)
+
+    def index_name(self, namespace):
+        """Return the Redis index name for the namespace."""
+        if namespace == self.default_namespace:
+            return DEFAULT_INDEX_NAME
+        tenant = re.sub(r"[^A-Za-z0-9_-]", "_", str(namespace.tenant))
+        digest = hashlib.sha1(namespace.key.encode("utf-8")).hexdigest()[:10]
+        return f"{DEFAULT_INDEX_NAME}_{tenant}_{digest}"
+
+    def cache_for(self, namespace):
+        """Return the SemanticCache for the namespace, creating it on first use."""
+        cache = self._caches.get(namespace)
+        if cache is not None:
+            return cache
+
+        with self._lock:
+            cache = self._caches.get(namespace)
+            if cache is None:
+                if self.max_namespaces is not None and len(self._caches) >= self.max_namespaces:
+                    raise ValueError(f"Cache namespace limit ({self.max_namespaces}) reached")
+                url = self.node_for(namespace)
+                client = self._clients.get(url)
+                if client is None:
+                    client = redis.Redis.from_url(url)
+                    self._clients[url] = client
+                cache = SemanticCache(
+                    name=self.index_name(namespace),
+                    redis_client=client,
+                    vectorizer=self.vectorizer,
+                    distance_threshold=self.distance_threshold
+                )
+                self._caches[namespace] = cache
+        return cache
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Tests for the distance threshold calibration helpers (no Redis, OpenAI or model needed).
+Run with pytest, or directly: python test_calibration.py
+"""
+import numpy as np
+
+from rsearch_module.calibration import pair_distances, recommend_threshold, replay_hits, threshold_curves
+
+
+def chain(count, step_distance):
+    """Unit vectors on a circle, each step_distance (cosine) from the previous one."""
+    angles = np.arange(count) * np.arccos(1.0 - step_distance)
+    return np.stack([np.cos(angles), np.sin(angles)], axis=1).astype(np.float32)
+
+
+def brute_force_replay(vectors, threshold):
+    """Reference replay: one query at a time against a list of stored misses."""
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    stored, hits = [], []
+    for vector in unit:
+        hit = any(1.0 - vector @ other <= threshold for other in stored)
+        hits.append(hit)
+        if not hit:
+            stored.append(vector)
+    return hits
+
+
+def clustered_log(count, seed):
+    """A query log with many near-duplicates, so hits and misses interleave."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(6, 16))
+    return (centers[rng.integers(0, 6, count)] + 0.3 * rng.normal(size=(count, 16))).astype(np.float32)
+
+
+def test_pair_distances():
+    a = np.array([[1, 0], [0, 2], [1, 1]], dtype=np.float32)
+    b = np.array([[3, 0], [1, 0], [-1, -1]], dtype=np.float32)
+    np.testing.assert_allclose(pair_distances(a, b), [0.0, 1.0, 2.0], atol=1e-6)
+
+
+def test_replay_matches_brute_force_across_blocks():
+    """Small blocks exercise the earlier-block and within-block paths."""
+    vectors = clustered_log(50, 1)
+    thresholds = [0.0, 0.05, 0.1, 0.2, 0.4]
+    for block_size in (1, 3, 7, 50, 64):
+        hits = replay_hits(vectors, thresholds, block_size=block_size)
+        for row, threshold in enumerate(thresholds):
+            assert hits[row].tolist() == brute_force_replay(vectors, threshold), (block_size, threshold)
+
+
+def test_replay_stores_only_misses():
+    """A hit is not stored, so a chain of near neighbours alternates miss and hit."""
+    hits = replay_hits(chain(6, 0.08), [0.1])
+    assert hits[0].tolist() == [False, True, False, True, False, True]
+
+    curves = threshold_curves([0.1], [0.5], [False], hits)
+    assert curves["hit_ratio"][0] == 0.5
+
+
+def test_threshold_curves_without_negatives():
+    """With no non-paraphrase pairs the false-hit rate is zero, not a division error."""
+    curves = threshold_curves([0.1, 0.2], [0.05, 0.15], [True, True], np.zeros((2, 0), dtype=bool))
+    assert curves["false_hit_rate"].tolist() == [0.0, 0.0]
+    assert curves["paraphrase_recall"].tolist() == [0.5, 1.0]
+    assert curves["hit_ratio"].tolist() == [0.0, 0.0]
+
+
+def test_recommend_threshold_prefers_strictest_tie():
+    curves = {
+        "hit_ratio": np.array([0.2, 0.5, 0.5, 0.7]),
+        "false_hit_rate": np.array([0.0, 0.005, 0.01, 0.05]),
+    }
+    assert recommend_threshold(curves, max_false_hit_rate=0.01) == 1
+
+
+def test_recommend_threshold_none_when_over_budget():
+    curves = {
+        "hit_ratio": np.array([0.2, 0.5]),
+        "false_hit_rate": np.array([0.02, 0.05]),
+    }
+    assert recommend_threshold(curves, max_false_hit_rate=0.01) is None
+
+
+if __name__ == "__main__":
+    print("🧪 Running calibration tests\n")
+    tests = [
+        test_pair_distances,
+        test_replay_matches_brute_force_across_blocks,
+        test_replay_stores_only_misses,
+        test_threshold_curves_without_negatives,
+        test_recommend_threshold_prefers_strictest_tie,
+        test_recommend_threshold_none_when_over_budget,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"   {test.__name__}: ✅ PASS")
+        except Exception as e:
+            failed += 1
+            print(f"   {test.__name__}: ❌ FAIL ({e!r})")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Round-trip tests for L1 index snapshots (no Redis or OpenAI needed).
+Run with pytest, or directly: python test_local_index.py
+"""
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+from rsearch_module.local_index import LocalSemanticIndex, MANIFEST_FILE
+
+DIMS = 32
+
+
+def random_vectors(count, seed):
+    """Unit vectors close to an 8-dim subspace, so an 8-dim PCA keeps nearly all of them."""
+    rng = np.random.default_rng(0)
+    basis = rng.normal(size=(8, DIMS))
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, 8)) @ basis + 0.01 * rng.normal(size=(count, DIMS))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def fill(index, vectors, offset=0):
+    for i, vector in enumerate(vectors):
+        index.add(vector, f"response {offset + i}", {"row": offset + i})
+
+
+def assert_finds_every_row(index, vectors, offset=0):
+    for i, vector in enumerate(vectors):
+        response, metadata, distance = index.search(vector, 1e-4)
+        assert response == f"response {offset + i}", (i, response)
+        assert metadata == {"row": offset + i}
+        assert distance < 1e-4
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_snapshot_restore_append_restore():
+    """Snapshot, restore, add more, snapshot again and restore the appended segments."""
+    first, second = random_vectors(300, 1), random_vectors(200, 2)
+    with tempfile.TemporaryDirectory() as path:
+        index = LocalSemanticIndex(dims=DIMS)
+        fill(index, first)
+        assert index.snapshot(path) == 300
+
+        restored = LocalSemanticIndex.restore(path)
+        assert len(restored) == 300
+        assert_finds_every_row(restored, first)
+
+        fill(restored, second, offset=300)
+        assert restored.snapshot(path) == 200
+        assert restored.snapshot(path) == 0
+        assert [segment["count"] for segment in read_manifest(path)["segments"]] == [300, 200]
+
+        restored = LocalSemanticIndex.restore(path)
+        assert len(restored) == 500
+        assert_finds_every_row(restored, np.concatenate([first, second]))
+
+
+def test_restore_reuses_saved_projection():
+    """A restored index searches in two stages straight away, without refitting."""
+    first, second = random_vectors(600, 3), random_vectors(300, 4)
+    with tempfile.TemporaryDirectory() as path:
+        index = LocalSemanticIndex(dims=DIMS, reduced_dims=8, shortlist=16, refit_every=256)
+        fill(index, first)
+        index.refit()
+        index.snapshot(path)
+
+        restored = LocalSemanticIndex.restore(path, reduced_dims=8, shortlist=16, refit_every=256)
+        assert restored.two_stage
+        assert restored.last_refit_ms is None
+        assert isinstance(restored._reduced_base[0][1], np.memmap)
+        np.testing.assert_array_equal(restored._projection[1], index._projection[1])
+        assert_finds_every_row(restored, first)
+
+        # Appended rows are projected with the restored PCA and saved with it
+        fill(restored, second[:100], offset=600)
+        restored.snapshot(path)
+        manifest = read_manifest(path)
+        assert [segment.get("projection") for segment in manifest["segments"]] == [manifest["projection"]["name"]] * 2
+
+        # After a refit, the next snapshot saves the new projection
+        fill(restored, second[100:], offset=700)
+        restored.refit()
+        restored.snapshot(path)
+        manifest = read_manifest(path)
+        assert manifest["projection"]["rows"] == 700
+        assert manifest["segments"][-1]["projection"] == manifest["projection"]["name"]
+
+        again = LocalSemanticIndex.restore(path, reduced_dims=8, shortlist=16, refit_every=256)
+        assert again.two_stage
+        np.testing.assert_array_equal(again._projection[1], restored._projection[1])
+        assert_finds_every_row(again, np.concatenate([first, second]))
+
+
+def test_restore_with_other_reduced_dims_refits():
+    """A saved projection of a different size is ignored and refitted in the background."""
+    vectors = random_vectors(400, 5)
+    with tempfile.TemporaryDirectory() as path:
+        index = LocalSemanticIndex(dims=DIMS, reduced_dims=8)
+        fill(index, vectors)
+        index.refit()
+        index.snapshot(path)
+
+        restored = LocalSemanticIndex.restore(path, reduced_dims=4, shortlist=128)
+        restored.refit()
+        assert restored.two_stage
+        assert restored._projection[1].shape == (4, DIMS)
+        assert_finds_every_row(restored, vectors)
+
+
+def test_restore_rejects_other_dtypes():
+    """Snapshots are float32 only."""
+    with tempfile.TemporaryDirectory() as path:
+        index = LocalSemanticIndex(dims=DIMS)
+        fill(index, random_vectors(10, 6))
+        index.snapshot(path)
+        manifest = read_manifest(path)
+        manifest["dtype"] = "float16"
+        with open(os.path.join(path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+        try:
+            LocalSemanticIndex.restore(path)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("float16 snapshot was restored")
+
+
+def test_projection_from_another_writer_is_not_reused():
+    """Two processes appending to one directory never pair rows with another writer's projected rows."""
+    base, rows_a, rows_b = random_vectors(300, 8), random_vectors(100, 9), random_vectors(400, 10)
+    with tempfile.TemporaryDirectory() as path:
+        index = LocalSemanticIndex(dims=DIMS, reduced_dims=8, shortlist=16)
+        fill(index, base)
+        index.refit()
+        index.snapshot(path)
+
+        writer_a = LocalSemanticIndex.restore(path, reduced_dims=8, shortlist=16)
+        writer_b = LocalSemanticIndex.restore(path, reduced_dims=8, shortlist=16)
+        fill(writer_a, rows_a, offset=300)
+        writer_a.snapshot(path)
+        fill(writer_b, rows_b[:100], offset=400)
+        writer_b.snapshot(path)
+
+        # writer_b's new projection covers its own rows 0..400, which are not the manifest's first 400
+        fill(writer_b, rows_b[100:], offset=500)
+        writer_b.refit()
+        writer_b.snapshot(path)
+        manifest = read_manifest(path)
+        assert manifest["projection"]["rows"] == 400
+        assert [segment["count"] for segment in manifest["segments"]] == [300, 100, 100, 300]
+
+        restored = LocalSemanticIndex.restore(path, reduced_dims=8, shortlist=16)
+        assert restored._persisted_projection_name is None
+        restored.refit()
+        assert_finds_every_row(restored, np.concatenate([base, rows_a, rows_b]))
+
+
+def test_concurrent_snapshots():
+    """Snapshots racing with each other and with adds never lose or duplicate rows."""
+    vectors = random_vectors(2000, 7)
+    with tempfile.TemporaryDirectory() as path:
+        index = LocalSemanticIndex(dims=DIMS)
+        fill(index, vectors[:100])
+        index.snapshot(path)
+
+        def add_rest():
+            fill(index, vectors[100:], offset=100)
+
+        def snapshot_repeatedly():
+            for _ in range(20):
+                index.snapshot(path)
+
+        threads = [threading.Thread(target=add_rest)] + [threading.Thread(target=snapshot_repeatedly) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        index.snapshot(path)
+
+        segments = read_manifest(path)["segments"]
+        assert sum(segment["count"] for segment in segments) == 2000
+        assert len({segment["name"] for segment in segments}) == len(segments)
+        assert_finds_every_row(LocalSemanticIndex.restore(path), vectors)
+
+
+if __name__ == "__main__":
+    print("🧪 Running L1 index snapshot tests\n")
+    tests = [
+        test_snapshot_restore_append_restore,
+        test_restore_reuses_saved_projection,
+        test_restore_with_other_reduced_dims_refits,
+        test_restore_rejects_other_dtypes,
+        test_projection_from_another_writer_is_not_reused,
+        test_concurrent_snapshots,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"   {test.__name__}: ✅ PASS")
+        except Exception as e:
+            failed += 1
+            print(f"   {test.__name__}: ❌ FAIL ({e!r})")
+    raise SystemExit(1 if failed else 0)